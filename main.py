@@ -1,126 +1,362 @@
 import os
-import json
+import re
+import atexit
+import base64
+import sys
+import logging
 import hashlib
+import smtplib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
 
+import orjson
 from google.cloud import firestore
 from google.auth.exceptions import DefaultCredentialsError
+from google.rpc import code_pb2
 
 # --- SCRAPERS ---
+from scrapers import (
+    fetch_scope,
+    load_validators,
+    mark_fetches_handled,
+    reset_failed_hosts,
+)
+from scrapers.ashby import fetch_ashby_jobs
 from scrapers.greenhouse import fetch_greenhouse_jobs
+from scrapers.lever import fetch_lever_jobs
+from scrapers.workday import fetch_workday_jobs
+
+
+log = logging.getLogger(__name__)
 
 
 # -----------------------------------
 # CONFIG
 # -----------------------------------
 
+COMPANIES_PATH = "config/companies.json"
+FILTERS_PATH = "config/filters.json"
+
 # Only fresh jobs within 2 hours
 FRESH_MINUTES = 120
 
-ROLE_KEYWORDS = [
-    "software engineer", "swe",
-    "ml engineer", "machine learning engineer",
-    "ai engineer", "ai/ml engineer",
-    "data scientist", "data science",
-    "data engineer",
-    "security engineer", "cybersecurity",
-    "security analyst",
-    "application security", "cloud security",
-    "site reliability engineer", "sre",
-    "platform engineer"
-]
-
-LEVEL_KEYWORDS = [
-    "entry level", "new grad", "new graduate",
-    "graduate", "junior", "early career",
-    "associate", "assistant"
-]
-
-EXCLUDE_KEYWORDS = [
-    "intern", "internship", "intern -", "intern,",
-    "senior", "sr.", "sr ", "staff",
-    "principal", "lead ", "manager",
-    "director", "vp ", "vice president",
-    "iii", "iv", "v "
-]
-
-LOCATION_KEYWORDS = [
-    "us", "usa", "u.s.", "united states",
-    "remote-us", "remote us", "remote (us)",
-    "anywhere in the us", "across the us",
-    "within the united states",
-    "hybrid", "onsite", "on-site"
-]
+# Companies fetched concurrently (scraping is network-bound)
+FETCH_WORKERS = 16
+
+# ATS name (companies.json "ats") -> fetch_*_jobs(company, careers_url)
+SCRAPERS = {
+    "greenhouse": fetch_greenhouse_jobs,
+    "lever": fetch_lever_jobs,
+    "workday": fetch_workday_jobs,
+    "ashby": fetch_ashby_jobs,
+}
+
+# jobs_seen writes that fail with these gRPC codes are retried, up to
+# MAX_WRITE_ATTEMPTS; anything else (PERMISSION_DENIED, ...) fails at once.
+RETRYABLE_WRITE_CODES = {
+    code_pb2.DEADLINE_EXCEEDED,
+    code_pb2.RESOURCE_EXHAUSTED,
+    code_pb2.ABORTED,
+    code_pb2.INTERNAL,
+    code_pb2.UNAVAILABLE,
+}
+MAX_WRITE_ATTEMPTS = 5
+
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 465
+
+# Keyword lists live in config/filters.json so they can be tuned without
+# touching code; all matching is lowercase substring search.
+with open(FILTERS_PATH, "rb") as _f:
+    _FILTERS_RAW = _f.read()
+_FILTERS = orjson.loads(_FILTERS_RAW)
+
+# Bump whenever the matching logic (normalize_job, job_matches) changes, so
+# boards skipped as unchanged are re-filtered under the new rules.
+FILTER_VERSION = 1
+
+# Identifies the filter config, matching logic and scraper set that saved
+# board validators were handled under; a change makes the next run re-filter
+# every board.
+_FILTERS_KEY = hashlib.blake2b(
+    _FILTERS_RAW + f"|{FILTER_VERSION}|{','.join(sorted(SCRAPERS))}".encode(),
+    digest_size=16,
+).hexdigest()
+
+ROLE_KEYWORDS = _FILTERS["role_keywords"]
+LEVEL_KEYWORDS = _FILTERS["level_keywords"]
+EXCLUDE_KEYWORDS = _FILTERS["exclude_keywords"]
+LOCATION_KEYWORDS = _FILTERS["location_keywords"]
+
+
+def _keyword_pattern(keywords):
+    """
+    Compile a keyword list into a single alternation so each text is
+    scanned once instead of once per keyword.
+    """
+    alternatives = sorted(keywords, key=len, reverse=True)
+    return re.compile("|".join(re.escape(k) for k in alternatives))
+
+
+_ROLE_RE = _keyword_pattern(ROLE_KEYWORDS)
+_LEVEL_RE = _keyword_pattern(LEVEL_KEYWORDS)
+_EXCLUDE_RE = _keyword_pattern(EXCLUDE_KEYWORDS)
+_LOCATION_RE = _keyword_pattern(LOCATION_KEYWORDS) if LOCATION_KEYWORDS else None
 
 
 # -----------------------------------
 # HELPERS
 # -----------------------------------
 
+# One companies.json entry
+Company = namedtuple("Company", "name ats careers_url")
+
+# Parsed companies.json, kept across warm invocations of main()
+_companies_cache = None
+_companies_mtime = None
+
+# Logged-in SMTP session, kept across warm invocations of main()
+_smtp = None
+
+
 def _norm(text: str) -> str:
     return (text or "").lower()
 
 
 def load_companies():
-    print("[INFO] Loading companies.json...")
-    with open("config/companies.json") as f:
-        data = json.load(f)
-    print(f"[INFO] Loaded {len(data)} companies.")
+    """
+    Parse companies.json into a tuple of Company, reusing the last result
+    while the file is unchanged.
+    """
+    global _companies_cache, _companies_mtime
+
+    mtime = os.stat(COMPANIES_PATH).st_mtime_ns
+    if _companies_cache is not None and mtime == _companies_mtime:
+        log.info("Reusing %d cached companies.", len(_companies_cache))
+        return _companies_cache
+
+    log.info("Loading companies.json...")
+    with open(COMPANIES_PATH, "rb") as f:
+        raw = orjson.loads(f.read())
+    data = tuple(Company(c["name"], c["ats"], c["careers_url"]) for c in raw)
+    log.info("Loaded %d companies.", len(data))
+
+    _companies_cache, _companies_mtime = data, mtime
     return data
 
 
+def normalize_job(job: dict) -> dict:
+    """
+    Lowercase the short matched fields once, at fetch time. The description
+    is left to job_matches(), which only lowercases it for jobs that survive
+    the cheap title and location checks.
+    """
+    # Trailing space keeps word-final keywords ("lead ", "sr ") matching at
+    # the end of the title, as they did when title and description were joined.
+    job["_title_lc"] = _norm(job.get("title")) + " "
+    job["_loc_lc"] = _norm(job.get("location"))
+    return job
+
+
 def job_matches(job: dict) -> bool:
-    title = _norm(job.get("title"))
-    desc = _norm(job.get("description"))
-    loc = _norm(job.get("location"))
-    combined = f"{title} {desc}"
+    # Changing what matches here or in normalize_job()? Bump FILTER_VERSION.
+    title = job["_title_lc"]
 
-    if not any(k in combined for k in ROLE_KEYWORDS):
+    # Cheapest checks first: the location and title are short, the
+    # description is often several KB of HTML.
+    if _LOCATION_RE and not _LOCATION_RE.search(job["_loc_lc"]):
         return False
 
-    if not any(k in combined for k in LEVEL_KEYWORDS):
+    # Seniority is judged on the title only; descriptions routinely mention
+    # "senior engineers", "internal tools", "staffing", ... about the team.
+    if _EXCLUDE_RE.search(title):
         return False
 
-    if any(k in combined for k in EXCLUDE_KEYWORDS):
+    has_role = _ROLE_RE.search(title) is not None
+    has_level = _LEVEL_RE.search(title) is not None
+    if has_role and has_level:
+        return True
+
+    # Title alone is not conclusive: lowercase the description once and
+    # look there for whatever the title was missing.
+    desc = _norm(job.get("description"))
+
+    if not has_role and not _ROLE_RE.search(desc):
         return False
 
-    if LOCATION_KEYWORDS and not any(k in loc for k in LOCATION_KEYWORDS):
+    if not has_level and not _LEVEL_RE.search(desc):
         return False
 
     return True
 
 
-def job_id(company: str, job: dict) -> str:
-    base = f"{company}|{job.get('title','')}|{job.get('url','')}"
-    return hashlib.md5(base.encode()).hexdigest()
+def _job_key(company: str, job: dict) -> bytes:
+    return f"{company}|{job.get('title','')}|{job.get('url','')}".encode()
+
+
+def job_id(company: str, job: dict) -> bytes:
+    """
+    16-byte dedup key. Kept as raw bytes in memory; jobs_seen documents are
+    named by doc_name(job_id).
+    """
+    return hashlib.blake2b(_job_key(company, job), digest_size=16).digest()
+
+
+def legacy_job_id(company: str, job: dict) -> bytes:
+    """MD5 form of job_id(); older jobs_seen documents are still keyed by it."""
+    return hashlib.md5(_job_key(company, job), usedforsecurity=False).digest()
+
+
+def doc_name(jid: bytes) -> str:
+    """jobs_seen document name for a job ID: 22-char unpadded urlsafe base64."""
+    name = base64.urlsafe_b64encode(jid).rstrip(b"=").decode()
+    # Firestore reserves IDs matching __.*__; fall back to hex for those.
+    if name.startswith("__") and name.endswith("__"):
+        return jid.hex()
+    return name
+
+
+def stored_names(company: str, job: dict, jid: bytes) -> tuple:
+    """
+    Every jobs_seen document name this job may already be stored under:
+    the current name and the hex MD5 ID of older documents.
+    """
+    return doc_name(jid), legacy_job_id(company, job).hex()
+
+
+def fetch_company_jobs(company: Company) -> list:
+    name, ats, url = company
+
+    log.debug("Fetching jobs for: %s (%s)", name, ats)
+
+    fetch = SCRAPERS.get(ats)
+    if not fetch:
+        log.warning("ATS %s not supported.", ats)
+        return []
+
+    # Runs on a pool thread: one broken board must not abort the whole run
+    # and throw away every other company's results.
+    try:
+        with fetch_scope():
+            jobs = fetch(name, url)
+    except Exception:
+        log.exception("%s: %s scraper crashed.", name, ats)
+        return []
+
+    log.debug("%s: %d raw jobs.", name, len(jobs))
+    return [normalize_job(job) for job in jobs]
 
 
 def get_firestore_client():
     try:
         client = firestore.Client()
-        print("[INFO] Firestore ENABLED — using jobs_seen collection.")
+        log.info("Firestore ENABLED — using jobs_seen collection.")
         return client
     except DefaultCredentialsError as e:
-        print("[INFO] Firestore DISABLED — dev mode. Reason:", e)
+        log.info("Firestore DISABLED — dev mode. Reason: %s", e)
         return None
     except Exception as e:
-        print("[INFO] Firestore DISABLED — unexpected error:", e)
+        log.info("Firestore DISABLED — unexpected error: %s", e)
         return None
 
 
-def send_email(new_jobs):
-    import smtplib
-    from email.mime.text import MIMEText
+def lookup_seen(db, names) -> set:
+    """Return which of the given jobs_seen document names already exist."""
+    collection = db.collection("jobs_seen")
+    refs = [collection.document(name) for name in names]
+    return {snap.id for snap in db.get_all(refs) if snap.exists}
+
+
+def save_seen_jobs(db, pending):
+    """
+    Write (job_id, record) pairs to jobs_seen through a BulkWriter, which
+    batches and pipelines the writes. Raises unless every write is confirmed,
+    so jobs that were not saved are never emailed or marked handled.
+    """
+    failures = []
+    saved = []
+
+    def on_write_error(failure, _bulk) -> bool:
+        # BulkWriter's default retries every error 15 times and then drops
+        # the write silently; retry only transient errors, record the rest.
+        if failure.code in RETRYABLE_WRITE_CODES and failure.attempts < MAX_WRITE_ATTEMPTS:
+            return True
+        failures.append(failure)
+        return False
+
+    collection = db.collection("jobs_seen")
+    bulk = db.bulk_writer()
+    bulk.on_write_error(on_write_error)
+    # A whole BatchWrite RPC failing raises on BulkWriter's executor thread
+    # and is dropped without reaching on_write_error; only counting confirmed
+    # writes catches that.
+    bulk.on_write_result(lambda ref, _result, _bulk: saved.append(ref))
+    for jid, record in pending:
+        bulk.set(collection.document(doc_name(jid)), record)
+    bulk.close()
+
+    if failures:
+        for failure in failures:
+            log.error("jobs_seen write failed (code %d): %s", failure.code, failure.message)
+        raise RuntimeError(f"{len(failures)} of {len(pending)} jobs_seen writes failed")
+    if len(saved) != len(pending):
+        raise RuntimeError(f"Only {len(saved)} of {len(pending)} jobs_seen writes were confirmed")
+
+    log.info("Saved %d jobs to jobs_seen.", len(pending))
+
+
+def _get_smtp(email_address: str, email_password: str):
+    """
+    Return a logged-in SMTP session, reusing the previous one while it still
+    answers NOOP so warm invocations skip the TLS handshake and login.
+    """
+    global _smtp
+
+    if _smtp is not None:
+        try:
+            if _smtp.noop()[0] == 250:
+                return _smtp
+        except (smtplib.SMTPException, OSError):
+            pass
+        try:
+            _smtp.close()
+        except OSError:
+            pass
+        _smtp = None
+
+    server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT)
+    try:
+        server.login(email_address, email_password)
+    except smtplib.SMTPException:
+        server.close()
+        raise
+    _smtp = server
+    return server
 
+
+@atexit.register
+def _close_smtp():
+    """Say QUIT on the cached session at interpreter exit."""
+    if _smtp is None:
+        return
+    try:
+        _smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        pass
+
+
+def send_email(new_jobs):
     if not new_jobs:
-        print("[INFO] No new jobs — skipping email.")
+        log.info("No new jobs — skipping email.")
         return
 
     email_address = os.environ.get("EMAIL_ADDRESS", "").strip()
     email_password = os.environ.get("EMAIL_PASSWORD", "").strip()
 
     if not email_address or not email_password:
-        print("[WARN] Missing email env vars — cannot send mail.")
+        log.warning("Missing email env vars — cannot send mail.")
         return
 
     lines = []
@@ -131,16 +367,16 @@ def send_email(new_jobs):
             lines.append(f"Location: {j['location']}")
         lines.append("")
 
-    msg = MIMEText("\n".join(lines))
+    msg = EmailMessage()
+    msg.set_content("\n".join(lines))
     msg["Subject"] = f"{len(new_jobs)} New Jobs Found"
     msg["From"] = email_address
     msg["To"] = email_address
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(email_address, email_password)
-        server.send_message(msg)
+    server = _get_smtp(email_address, email_password)
+    server.send_message(msg)
 
-    print("[INFO] Email sent successfully.")
+    log.info("Email sent successfully.")
 
 
 # -----------------------------------
@@ -148,42 +384,42 @@ def send_email(new_jobs):
 # -----------------------------------
 
 def main(request=None):
-    print("\n======== JOB ALERT AGENT STARTED ========\n")
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="[%(levelname)s] %(message)s",
+        stream=sys.stdout,
+    )
+    log.info("======== JOB ALERT AGENT STARTED ========")
 
     db = get_firestore_client()
     companies = load_companies()
 
-    if db:
-        seen_ids = {doc.id for doc in db.collection("jobs_seen").stream()}
-        print(f"[INFO] Loaded {len(seen_ids)} previously seen jobs.")
-    else:
-        seen_ids = set()
-        print("[INFO] Dev mode (no Firestore).")
-
-    new_jobs = []
-
-    for cfg in companies:
-        name = cfg["name"]
-        ats = cfg["ats"]
-        url = cfg["careers_url"]
+    if not db:
+        log.info("Dev mode (no Firestore).")
 
-        print(f"\n[INFO] Fetching jobs for: {name} ({ats})")
+    reset_failed_hosts()
+    load_validators(_FILTERS_KEY)
 
-        if ats == "greenhouse":
-            jobs = fetch_greenhouse_jobs(name, url)
-        else:
-            print(f"[WARN] ATS {ats} not supported in simplified mode.")
-            jobs = []
+    # Fetch every board concurrently; map() keeps results in config order
+    # so filtering and the email stay deterministic.
+    log.info("Fetching %d companies with %d workers...", len(companies), FETCH_WORKERS)
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        results = list(pool.map(fetch_company_jobs, companies))
 
-        print(f"[INFO] {name}: {len(jobs)} raw jobs.")
+    # IDs taken this run, so a posting listed twice is only handled once
+    seen_ids = set()
+    candidates = []
 
-        for job in jobs:
-            if not job_matches(job):
-                continue
+    for company, jobs in zip(companies, results):
+        name = company.name
+        matched = 0
 
+        for job in filter(job_matches, jobs):
             jid = job_id(name, job)
             if jid in seen_ids:
                 continue
+            seen_ids.add(jid)
+            matched += 1
 
             record = {
                 "company": name,
@@ -191,18 +427,44 @@ def main(request=None):
                 "location": job.get("location", ""),
                 "url": job.get("url", "")
             }
+            candidates.append((jid, stored_names(name, job, jid), record))
+
+        log.debug("%s: %d matching jobs.", name, matched)
 
-            if db:
-                db.collection("jobs_seen").document(jid).set(record)
+    # Point lookups for this run's matches only, instead of streaming the
+    # whole jobs_seen history on every run.
+    existing = set()
+    if db and candidates:
+        existing = lookup_seen(db, [n for _, names, _ in candidates for n in names])
 
-            new_jobs.append(record)
+    new_jobs = []
+    pending_writes = []
+
+    for jid, (current, legacy), record in candidates:
+        if current in existing:
+            continue
+
+        if legacy in existing:
+            # Already alerted under an older name: re-key it, don't re-send.
+            pending_writes.append((jid, record))
+            continue
 
-        print(f"[INFO] {name}: {len(new_jobs)} new jobs accumulated so far.")
+        pending_writes.append((jid, record))
+        new_jobs.append(record)
+
+    log.info("%d of %d matching jobs already seen.", len(candidates) - len(new_jobs), len(candidates))
+    log.info("FINAL: Found %d new jobs.", len(new_jobs))
+
+    if db and pending_writes:
+        save_seen_jobs(db, pending_writes)
 
-    print(f"\n[INFO] FINAL: Found {len(new_jobs)} new jobs.")
     send_email(new_jobs)
 
-    print("\n======== JOB ALERT AGENT FINISHED ========\n")
+    # Everything fetched this run is now saved and sent, so boards that are
+    # unchanged next time can be skipped.
+    mark_fetches_handled()
+
+    log.info("======== JOB ALERT AGENT FINISHED ========")
     return "OK"
 
 
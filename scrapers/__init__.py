@@ -1 +1,286 @@
-# empty file is fine
\ No newline at end of file
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    MaxRetryError,
+    NewConnectionError,
+    ReadTimeoutError,
+    ResponseError,
+)
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+# Pooled connections kept per ATS host. Must cover main.FETCH_WORKERS, since
+# most companies share one host (boards-api.greenhouse.io, api.lever.co, ...).
+POOL_SIZE = 32
+
+# Longest Retry-After we honour; a rate limit asking for more loses the
+# company for this run instead of stalling a worker.
+MAX_RETRY_AFTER = 10
+
+
+class _Retry(Retry):
+    """
+    urllib3 Retry that never retries a read timeout (a board that was slow
+    once will be slow again, and each retry costs another full read timeout)
+    and gives up when Retry-After exceeds MAX_RETRY_AFTER. Other read errors,
+    like a pooled keep-alive connection the server dropped, are still retried.
+    """
+
+    def increment(
+        self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None
+    ):
+        if isinstance(error, ReadTimeoutError):
+            raise error.with_traceback(_stacktrace)
+        if (
+            response is not None
+            and self.respect_retry_after_header
+            and response.status in self.RETRY_AFTER_STATUS_CODES
+        ):
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None and retry_after > MAX_RETRY_AFTER:
+                reason = f"Retry-After {retry_after:.0f}s exceeds {MAX_RETRY_AFTER}s"
+                raise MaxRetryError(_pool, url, ResponseError(reason))
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+# One session shared by every scraper so fetches to the same ATS host reuse
+# warm TCP/TLS connections instead of handshaking per company.
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=POOL_SIZE,
+        pool_maxsize=POOL_SIZE,
+        # Ride out brief rate limiting / gateway blips instead of losing the
+        # company for this run. Retry-After is honoured on 429/503; otherwise
+        # back off exponentially with jitter so workers don't retry in step.
+        # POST is included for the Workday search, which is read-only.
+        max_retries=_Retry(
+            total=3,
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["GET", "POST"]),
+            respect_retry_after_header=True,
+        ),
+    ),
+)
+
+# (connect, read) seconds. Connecting to a healthy ATS takes well under a
+# second; waiting 15s+ on a dead host only stalls a worker.
+TIMEOUT = (3, 7)
+
+# Hosts that could not be connected to during this run; later calls to them
+# fail fast instead of waiting out another connect timeout. A slow or failing
+# response only concerns that one board (most companies share a host), so
+# read timeouts and HTTP errors never trip this.
+_failed_hosts = set()
+
+# Where validators are kept between runs (the workflow caches .cache/)
+VALIDATORS_PATH = os.environ.get("VALIDATORS_PATH", ".cache/validators.json")
+
+
+# url -> (ETag, Last-Modified) of the last response whose jobs were fully handled
+_validators = {}
+# Filter configuration _validators were handled under; see load_validators()
+_validators_key = None
+# Validators seen during the current run; promoted by mark_fetches_handled()
+_pending_validators = {}
+# Per pool thread: URLs whose validators the current fetch_scope() recorded
+_local = threading.local()
+
+
+def _read_validators() -> dict:
+    try:
+        with open(VALIDATORS_PATH, "rb") as f:
+            data = orjson.loads(f.read())
+    except FileNotFoundError:
+        return {}
+    except (OSError, orjson.JSONDecodeError) as e:
+        # A bad cache only costs full downloads; never fail the run over it.
+        log.warning("Ignoring unreadable %s: %s", VALIDATORS_PATH, e)
+        return {}
+    if not isinstance(data, dict) or not isinstance(data.get("validators"), dict):
+        log.warning("Ignoring malformed %s.", VALIDATORS_PATH)
+        return {}
+    return data
+
+
+def _valid_pair(value) -> bool:
+    """An (ETag, Last-Modified) entry: two strings-or-nulls, at least one set."""
+    return (
+        isinstance(value, list)
+        and len(value) == 2
+        and all(v is None or isinstance(v, str) for v in value)
+        and any(value)
+    )
+
+
+def load_validators(key: str):
+    """
+    Load the validators saved by earlier runs; call at the start of each run.
+
+    A 304 skips the board entirely, which is only right if its postings were
+    handled under the same filters. `key` identifies the filter config; saved
+    validators from a different key are dropped so every board is fetched and
+    re-filtered in full.
+    """
+    global _validators_key
+    if key == _validators_key:
+        return
+
+    _validators.clear()
+    _pending_validators.clear()
+    _validators_key = key
+
+    stored = _read_validators()
+    if stored.get("key") != key:
+        if stored:
+            log.info("Filter config changed; ignoring saved validators.")
+        return
+    # Skip entries a hand edit or older format left malformed; those boards
+    # are simply fetched in full.
+    _validators.update(
+        (url, tuple(v)) for url, v in stored["validators"].items() if _valid_pair(v)
+    )
+
+
+class HostUnavailable(requests.ConnectionError):
+    """Raised without a network call for hosts that already failed this run."""
+
+
+def _connect_failed(exc: requests.RequestException) -> bool:
+    """True if `exc` means no connection could be established at all."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    # Refused / unresolvable hosts arrive as ConnectionError(MaxRetryError)
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, (ConnectTimeoutError, NewConnectionError))
+
+
+def request(method: str, url: str, **kwargs):
+    """
+    SESSION.request with the default TIMEOUT and a per-run circuit breaker:
+    once a connection to a host cannot be established, every later call to it
+    raises HostUnavailable immediately.
+    """
+    host = urlsplit(url).netloc
+    if host in _failed_hosts:
+        raise HostUnavailable(f"{host} already failed this run")
+
+    kwargs.setdefault("timeout", TIMEOUT)
+    try:
+        return SESSION.request(method, url, **kwargs)
+    except requests.RequestException as e:
+        if _connect_failed(e):
+            _failed_hosts.add(host)
+        raise
+
+
+def reset_failed_hosts():
+    """Give every host a fresh chance; call at the start of each run."""
+    _failed_hosts.clear()
+
+
+def get_if_modified(url: str, **kwargs):
+    """
+    Conditional GET against the shared session. Sends the validators from the
+    last handled fetch of `url` and returns None on 304 Not Modified (every
+    posting on the board was already processed); otherwise returns the
+    successful response.
+    """
+    headers = dict(kwargs.pop("headers", None) or {})
+    etag, last_modified = _validators.get(url, (None, None))
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    resp = request("GET", url, headers=headers, **kwargs)
+    if resp.status_code == 304:
+        return None
+    resp.raise_for_status()
+
+    validators = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+    if any(validators):
+        _pending_validators[url] = validators
+        fetched = getattr(_local, "fetched", None)
+        if fetched is not None:
+            fetched.append(url)
+    return resp
+
+
+@contextmanager
+def fetch_scope():
+    """
+    Wrap one company's scraper call. Validators recorded inside are dropped
+    again if the block raises or calls discard_fetched(), so a board whose
+    postings were never handled is fetched in full next run.
+    """
+    _local.fetched = []
+    try:
+        yield
+    except BaseException:
+        discard_fetched()
+        raise
+    finally:
+        _local.fetched = None
+
+
+def discard_fetched():
+    """Forget the validators recorded so far in this thread's fetch_scope()."""
+    fetched = getattr(_local, "fetched", None)
+    if not fetched:
+        return
+    for url in fetched:
+        _pending_validators.pop(url, None)
+    fetched.clear()
+
+
+def mark_fetches_handled():
+    """
+    Call once the run's results are saved and sent. Only then may later
+    runs skip unchanged boards; a crash before this re-fetches everything.
+    """
+    if not _pending_validators:
+        return
+    _validators.update(_pending_validators)
+    _pending_validators.clear()
+    _save_validators()
+
+
+def _save_validators():
+    """Write _validators to VALIDATORS_PATH atomically."""
+    tmp = VALIDATORS_PATH + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(VALIDATORS_PATH) or ".", exist_ok=True)
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps({"key": _validators_key, "validators": _validators}))
+        os.replace(tmp, VALIDATORS_PATH)
+    except OSError as e:
+        log.warning("Could not save %s: %s", VALIDATORS_PATH, e)
+
+
+@lru_cache(maxsize=256)
+def board_slug(value: str) -> str:
+    """
+    Board identifier from a careers URL or a bare slug:
+      https://boards.greenhouse.io/databricks -> databricks
+      jobs.ashbyhq.com/openai                 -> openai
+      scaleai                                 -> scaleai
+    """
+    if not value:
+        return ""
+    parts = [p for p in value.strip().split("/") if p]
+    return parts[-1] if parts else ""
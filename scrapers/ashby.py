@@ -1,18 +1,12 @@
-import requests
+import logging
 from datetime import datetime, timezone
 
+import orjson
+import requests
 
-def _extract_board_name(value: str) -> str:
-    """
-    If user passes an Ashby board URL, take last segment.
-    If they pass 'openai' etc., just return it.
-    """
-    if not value:
-        return ""
-    if value.startswith("http"):
-        parts = [p for p in value.strip().split("/") if p]
-        return parts[-1]
-    return value
+from scrapers import board_slug, discard_fetched, get_if_modified
+
+log = logging.getLogger(__name__)
 
 
 def fetch_ashby_jobs(company: str, board_value: str):
@@ -21,23 +15,26 @@ def fetch_ashby_jobs(company: str, board_value: str):
     - jobs.ashbyhq.com/<board_name>
     - OR just the <board_name> itself.
     """
-    board_name = _extract_board_name(board_value)
+    board_name = board_slug(board_value)
     if not board_name:
-        print(f"[ASHBY] No board_name for {company}, value={board_value}")
+        log.warning("[ASHBY] No board_name for %s, value=%s", company, board_value)
         return []
 
     api_url = f"https://jobs.ashbyhq.com/api/non-user-boards/{board_name}/jobs"
 
     try:
-        resp = requests.get(api_url, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-    except Exception as e:
-        print(f"[ERROR] Ashby API failed for {company}: {e}")
+        resp = get_if_modified(api_url)
+        if resp is None:
+            log.debug("[ASHBY] Board unchanged since last run for %s", company)
+            return []
+        data = orjson.loads(resp.content)
+    except (requests.RequestException, ValueError) as e:
+        log.error("Ashby API failed for %s: %s", company, e)
+        discard_fetched()
         return []
 
     jobs_raw = data.get("jobs", [])
-    print(f"[ASHBY] API returned {len(jobs_raw)} jobs for {company}")
+    log.debug("[ASHBY] API returned %d jobs for %s", len(jobs_raw), company)
 
     jobs = []
     for j in jobs_raw:
@@ -1,5 +1,14 @@
+import re
+import time
+import logging
+from datetime import datetime, timezone
+
+import orjson
 import requests
-from datetime import datetime, timedelta, timezone
+
+from scrapers import board_slug, discard_fetched, get_if_modified
+
+log = logging.getLogger(__name__)
 
 KEYWORDS_FLEXIBLE = [
     "software", "swe", "developer", "engineer", "backend", "full stack",
@@ -10,79 +19,84 @@ KEYWORDS_FLEXIBLE = [
 
 USA_KEYWORDS = ["united states", "usa", "us", "remote - us", "remote-us"]
 
+# How recent a posting must be to be kept
+RECENT_MINUTES = 30
 
-def normalize(text: str):
-    return text.lower().strip() if text else ""
+# One alternation per list, so each text is scanned once
+_FLEXIBLE_RE = re.compile("|".join(re.escape(kw) for kw in KEYWORDS_FLEXIBLE))
+_USA_RE = re.compile("|".join(re.escape(kw) for kw in USA_KEYWORDS))
 
 
-def is_recent(created_at_iso: str, minutes=30):
-    """Check if job was posted in last X minutes."""
-    try:
-        posted = datetime.fromisoformat(created_at_iso.replace("Z", "+00:00"))
-        return datetime.now(timezone.utc) - posted <= timedelta(minutes=minutes)
-    except:
-        return False
+def normalize(text: str):
+    return text.lower().strip() if text else ""
 
 
 def matches_flexible_keywords(title: str):
-    title = normalize(title)
-    return any(kw in title for kw in KEYWORDS_FLEXIBLE)
+    return _FLEXIBLE_RE.search(normalize(title)) is not None
 
 
 def is_usa(location: str):
     if not location:
         return False
-    loc = normalize(location)
-    return any(kw in loc for kw in USA_KEYWORDS)
+    return _USA_RE.search(normalize(location)) is not None
 
 
-def scrape(company_name, careers_url):
+def fetch_lever_jobs(company_name, careers_url):
     """
     Example: https://jobs.lever.co/scaleai
     API:     https://api.lever.co/v0/postings/scaleai?mode=json
     """
 
+    board = board_slug(careers_url)
+    if not board:
+        log.warning("[LEVER] No board for %s, url=%s", company_name, careers_url)
+        return []
+
+    api_url = f"https://api.lever.co/v0/postings/{board}?mode=json"
+
     try:
-        board = careers_url.rstrip("/").split("/")[-1]
-        api_url = f"https://api.lever.co/v0/postings/{board}?mode=json"
-
-        resp = requests.get(api_url, timeout=20)
-        resp.raise_for_status()
-        data = resp.json()
-    except Exception as e:
-        print(f"[LEVER] Error fetching {company_name}: {e}")
+        resp = get_if_modified(api_url)
+        if resp is None:
+            log.debug("[LEVER] Board unchanged since last run for %s", company_name)
+            return []
+        data = orjson.loads(resp.content)
+    except (requests.RequestException, ValueError) as e:
+        log.error("[LEVER] Error fetching %s: %s", company_name, e)
+        discard_fetched()
         return []
 
     results = []
+    # Lever's createdAt is epoch milliseconds; compare it as-is
+    cutoff_ms = int((time.time() - RECENT_MINUTES * 60) * 1000)
 
     for job in data:
-        title = job.get("text", "")
-        location = job.get("categories", {}).get("location", "")
+        # FILTERS, cheapest first: most postings are stale
         created = job.get("createdAt")
-
-        if not created:
-            continue
-
-        created_iso = datetime.utcfromtimestamp(created / 1000).isoformat() + "Z"
-
-        # FILTERS
-        if not is_recent(created_iso, minutes=30):
+        if not created or created < cutoff_ms:
             continue
 
+        title = job.get("text", "")
         if not matches_flexible_keywords(title):
             continue
 
+        location = job.get("categories", {}).get("location", "")
         if not is_usa(location):
             continue
 
+        created_iso = (
+            datetime.fromtimestamp(created / 1000, tz=timezone.utc)
+            .isoformat()
+            .replace("+00:00", "Z")
+        )
+
         results.append({
             "id": job.get("id"),
             "title": title,
             "company": company_name,
             "location": location,
-            "url": job.get("hostedUrl"),
+            "url": job.get("hostedUrl") or "",
             "created_at": created_iso
         })
 
-    print(f"[LEVER] {company_name}: {len(results)} filtered jobs")
+    log.debug("[LEVER] %s: %d filtered jobs", company_name, len(results))
     return results
@@ -1,30 +1,41 @@
 # scrapers/workday.py
 
-import json
 import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timezone, timedelta
 
+import orjson
 import requests
 
+from scrapers import request
+
+log = logging.getLogger(__name__)
+
 # How recent a posting must be to be considered "fresh"
 RECENT_MINUTES = 30
 
+# Postings per searchPagination page (Workday's maximum)
+PAGE_SIZE = 50
+
+# Pages fetched per tenant per run; later pages go out concurrently
+MAX_PAGES = 10
+PAGE_WORKERS = 4
+
 # Simple User-Agent to avoid some basic bot blocks
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; JobAlertBot/1.0; +https://github.com/harshusoma/job-alert-agent)"
 }
 
 
-def _is_recent(posted_at: datetime | None) -> bool:
-    """Return True if posted_at is within RECENT_MINUTES from now."""
-    if not isinstance(posted_at, datetime):
-        return False
-    now = datetime.now(timezone.utc)
-    return (now - posted_at) <= timedelta(minutes=RECENT_MINUTES)
+def _recent_cutoff() -> datetime:
+    """Oldest posted_at still considered recent, computed once per search."""
+    return datetime.now(timezone.utc) - timedelta(minutes=RECENT_MINUTES)
 
 
 def _parse_iso_datetime(value: str | None) -> datetime | None:
-    """Best-effort parser for Workday-like ISO strings."""
+    """Best-effort parser for Workday-like ISO strings; always returns UTC-aware."""
     if not value or not isinstance(value, str):
         return None
 
@@ -33,22 +44,26 @@ def _parse_iso_datetime(value: str | None) -> datetime | None:
     if v.endswith("Z"):
         v = v[:-1] + "+00:00"
 
+    # fromisoformat also covers date-only values like "2025-11-17"
     try:
-        return datetime.fromisoformat(v)
-    except Exception:
-        # Sometimes Workday only gives date "2025-11-17"
-        try:
-            return datetime.strptime(v, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-        except Exception:
-            return None
+        parsed = datetime.fromisoformat(v)
+    except ValueError:
+        return None
 
+    # Naive values (no offset, or date-only) are taken as UTC so they can be
+    # compared against the aware recency cutoff.
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
 
+
+@lru_cache(maxsize=256)
 def _build_workday_api_url(careers_url: str) -> str | None:
     """
     Try to convert a Workday careers URL like:
       https://nvidia.wd5.myworkdayjobs.com/en-US/NVIDIAExternalCareerSite
-    into the JSON API endpoint:
-      https://nvidia.wd5.myworkdayjobs.com/en-US/NVIDIAExternalCareerSite/fs/searchPagination/0/50
+    into the JSON API endpoint, without the page suffix:
+      https://nvidia.wd5.myworkdayjobs.com/en-US/NVIDIAExternalCareerSite/fs/searchPagination
     """
     if "myworkdayjobs.com" not in careers_url:
         # Not a real Workday host – we skip API scraping for now.
@@ -58,77 +73,82 @@ def _build_workday_api_url(careers_url: str) -> str | None:
     base = careers_url.split("?", 1)[0].rstrip("/")
 
     # Append standard Workday searchPagination path
-    return f"{base}/fs/searchPagination/0/50"
-
-
-def _workday_search(company: str, careers_url: str) -> list[dict]:
-    """
-    Hit the Workday JSON searchPagination API if possible and return raw postings.
-    This does NOT filter by role/level/location; that is done in main.job_matches().
-    """
-    api_url = _build_workday_api_url(careers_url)
-    if not api_url:
-        print(f"[WORKDAY] {company}: careers_url is not a Workday tenant, skipping API. url={careers_url}")
-        return []
+    return f"{base}/fs/searchPagination"
 
-    print(f"[WORKDAY] {company}: calling JSON API: {api_url}")
 
+def _search_page(company: str, api_url: str, offset: int) -> dict | None:
+    """POST one searchPagination page; None if it failed."""
     # Standard Workday search payload – we do a broad search
     payload = {
         "appliedFacets": {},
-        "limit": 50,
-        "offset": 0,
+        "limit": PAGE_SIZE,
+        "offset": offset,
         "searchText": ""  # empty = all jobs
     }
 
     try:
-        resp = requests.post(api_url, headers=HEADERS, json=payload, timeout=20)
+        resp = request("POST", f"{api_url}/{offset}/{PAGE_SIZE}", headers=HEADERS, json=payload)
         resp.raise_for_status()
-    except Exception as e:
-        print(f"Error:  Workday API failed for {company}: {e}")
-        return []
+    except requests.RequestException as e:
+        log.error("Workday API failed for %s (offset %d): %s", company, offset, e)
+        return None
 
     try:
-        data = resp.json()
-    except json.JSONDecodeError:
-        print(f"Error:  Workday API for {company} did not return valid JSON.")
-        return []
+        return orjson.loads(resp.content)
+    except orjson.JSONDecodeError:
+        log.error("Workday API for %s did not return valid JSON (offset %d).", company, offset)
+        return None
 
-    postings = data.get("jobPostings") or data.get("jobPostingsSearchResult", {}).get("jobPostings") or []
-    print(f"[WORKDAY] {company}: API returned {len(postings)} postings (before parsing).")
 
-    jobs: list[dict] = []
+def _page_postings(data: dict) -> tuple[list, int]:
+    """(postings, total) from one page; the shape varies by tenant."""
+    result = data.get("jobPostingsSearchResult") or {}
+    postings = data.get("jobPostings") or result.get("jobPostings") or []
+    total = data.get("total") or result.get("total") or 0
+    return postings, total
 
-    for p in postings:
-        title = p.get("title") or p.get("titlePlainText") or ""
-        if not title:
-            continue
 
-        # Location – Workday often uses locationsText or a list
-        location = ""
-        if isinstance(p.get("locationsText"), str):
-            location = p["locationsText"]
-        elif isinstance(p.get("locations"), list) and p["locations"]:
-            location = ", ".join(str(x) for x in p["locations"])
+def _workday_search(company: str, careers_url: str) -> list[dict]:
+    """
+    Hit the Workday JSON searchPagination API if possible and return raw postings.
+    This does NOT filter by role/level/location; that is done in main.job_matches().
+    """
+    api_url = _build_workday_api_url(careers_url)
+    if not api_url:
+        log.warning("[WORKDAY] %s: careers_url is not a Workday tenant, skipping API. url=%s", company, careers_url)
+        return []
 
-        # URL – usually something like 'externalPath' or 'externalUrl'
-        path = (
-            p.get("externalPath")
-            or p.get("externalUrl")
-            or p.get("jobPostingExternalUrl")
-            or ""
+    log.debug("[WORKDAY] %s: calling JSON API: %s", company, api_url)
+
+    data = _search_page(company, api_url, 0)
+    if data is None:
+        return []
+    postings, total = _page_postings(data)
+
+    # The first page reports the total; fetch the rest of it at once rather
+    # than one round trip after another.
+    if total > PAGE_SIZE * MAX_PAGES:
+        log.warning(
+            "[WORKDAY] %s: %d postings, only the first %d are fetched (MAX_PAGES=%d).",
+            company, total, PAGE_SIZE * MAX_PAGES, MAX_PAGES,
         )
-        url = ""
-        if path:
-            if path.startswith("http"):
-                url = path
-            else:
-                # Build full URL from careers_url base
-                base = careers_url.split("?", 1)[0].rstrip("/")
-                if not path.startswith("/"):
-                    path = "/" + path
-                url = base + path
+    offsets = range(PAGE_SIZE, min(total, PAGE_SIZE * MAX_PAGES), PAGE_SIZE)
+    if offsets:
+        with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as pool:
+            pages = pool.map(lambda offset: _search_page(company, api_url, offset), offsets)
+            for page in pages:
+                if page is not None:
+                    postings.extend(_page_postings(page)[0])
+
+    log.debug("[WORKDAY] %s: API returned %d postings (before parsing).", company, len(postings))
 
+    jobs: list[dict] = []
+    cutoff = _recent_cutoff()
+    # Relative posting paths hang off the careers site, e.g.
+    # <careers_url>/job/Santa-Clara/Engineer_JR1; strip query/slash once.
+    base = careers_url.split("?", 1)[0].rstrip("/")
+
+    for p in postings:
         # Posted date – Workday varies by tenant
         posted_raw = (
             p.get("postedOn")
@@ -147,10 +167,35 @@ def _workday_search(company: str, careers_url: str) -> list[dict]:
                 or posted_raw.get("iso8601")
             )
 
-        # We only keep "recent" postings; older ones will be ignored.
-        if not _is_recent(posted_at):
+        # We only keep "recent" postings; checked first since most are older.
+        if posted_at is None or posted_at < cutoff:
             continue
 
+        title = p.get("title") or p.get("titlePlainText") or ""
+        if not title:
+            continue
+
+        # Location – Workday often uses locationsText or a list
+        location = ""
+        if isinstance(p.get("locationsText"), str):
+            location = p["locationsText"]
+        elif isinstance(p.get("locations"), list) and p["locations"]:
+            location = ", ".join(str(x) for x in p["locations"])
+
+        # URL – usually something like 'externalPath' or 'externalUrl'
+        path = (
+            p.get("externalPath")
+            or p.get("externalUrl")
+            or p.get("jobPostingExternalUrl")
+            or ""
+        )
+        if not path or path.startswith("http"):
+            url = path
+        elif path[0] == "/":
+            url = base + path
+        else:
+            url = f"{base}/{path}"
+
         jobs.append(
             {
                 "company": company,
@@ -162,7 +207,7 @@ def _workday_search(company: str, careers_url: str) -> list[dict]:
             }
         )
 
-    print(f"[WORKDAY] {company}: returning {len(jobs)} recent jobs after time filter.")
+    log.debug("[WORKDAY] %s: returning %d recent jobs after time filter.", company, len(jobs))
     return jobs
 
 
@@ -171,9 +216,9 @@ def fetch_workday_jobs(company: str, careers_url: str) -> list[dict]:
     Public entry used by main.py.
     Tries Workday JSON API; if not applicable, returns [] safely.
     """
-    print(f"[INFO] Workday scraper starting for {company}: {careers_url}")
+    log.debug("Workday scraper starting for %s: %s", company, careers_url)
 
     jobs = _workday_search(company, careers_url)
 
-    print(f"[INFO] {company}: scraper returned {len(jobs)} raw jobs.")
+    log.debug("%s: scraper returned %d raw jobs.", company, len(jobs))
     return jobs